@@ -1,16 +1,20 @@
 import os
-from fastapi import FastAPI, Query
+import time
+import uuid
+import asyncio
+from typing import Optional, Tuple, List
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, BackgroundTasks, HTTPException
+from fastapi.responses import ORJSONResponse
 from src.services.scrapper import Scraper
 from src.services.extractor import Extractor
 from src.services.llm import ParseTables
 from src.services.sqlite import TariffDB
 from src.models.config import Config
+from src.logger import configure_logging
 
-app = FastAPI(
-    title="Shipping Tariff Extractor",
-    description="API to scrape, extract, parse and store shipping tariff data",
-    version="1.0.0"
-)
+# Configure logging once for every service
+configure_logging()
 
 # Load config
 cfg = Config.from_yaml(filepath=os.path.join(
@@ -19,38 +23,159 @@ cfg = Config.from_yaml(filepath=os.path.join(
 ))
 
 
-# Initialize services
-scrap_serv = Scraper()
-ex_serv = Extractor(config=cfg)
-parser = ParseTables(config=cfg)
-db = TariffDB(config=cfg)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Initialize services once at startup and share them across requests.
+    """
+    app.state.db = TariffDB(config=cfg)
+    app.state.scrap_serv = Scraper(config=cfg, db=app.state.db)
+    app.state.ex_serv = Extractor(config=cfg)
+    app.state.parser = ParseTables(config=cfg)
+    yield
+    app.state.db.close()
 
 
-@app.post("/upload")
-def upload_data(country: str):
+app = FastAPI(
+    title="Shipping Tariff Extractor",
+    description="API to scrape, extract, parse and store shipping tariff data",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# Upload jobs by id; the pipeline shares one model and download dir,
+# so jobs run one at a time
+jobs = dict()
+upload_lock = asyncio.Lock()
+
+# Finished jobs are kept for status polling this many seconds
+JOB_TTL = 3600
+
+
+def expire_jobs():
+    """
+    Drop finished jobs older than JOB_TTL so the job table doesn't grow without bound.
+    """
+    cutoff = time.time() - JOB_TTL
+    for job_id in [k for k, v in jobs.items() if v.get("finished_at", cutoff) < cutoff]:
+        del jobs[job_id]
+
+
+async def run_pipeline(country: str) -> Tuple[int, List[str]]:
+    """
+    Parse and store the tables of each PDF while the next PDF is extracted.
+    
+    The rows of a PDF are inserted in one transaction and the PDF is removed
+    only once every one of its tables was parsed and stored, so a PDF that
+    failed to convert, parse or store is retried on the next run without
+    duplicating rows that were already stored.
+    
+    Returns:
+        tuple: (number of inserted records, paths of the PDFs kept for a retry)
+    """
+    state = app.state
+    pdfs_q = asyncio.Queue(maxsize=1)
+
+    async def extract():
+        pdfs = state.ex_serv.iter_pdfs(country=country)
+        while (item := await asyncio.to_thread(next, pdfs, None)) is not None:
+            await pdfs_q.put(item)
+        await pdfs_q.put(None)
+
+    async def store():
+        count, kept = 0, list()
+        while (item := await pdfs_q.get()) is not None:
+            pdf_path, tables = item
+            if tables is None:
+                # Kept on disk for a retry
+                kept.append(pdf_path)
+                continue
+
+            parsed = await state.parser.run_many(tables=tables)
+            if None in parsed:
+                # Store nothing, so the retry of the whole PDF does not insert
+                # the rows of its other tables a second time
+                kept.append(pdf_path)
+                continue
+
+            rows = [i.values() for res in parsed for i in res]
+            inserted = await asyncio.to_thread(state.db.insert_many, rows=rows)
+            count += inserted
+            if inserted != len(rows):
+                # insert_many rolled back, so nothing of this PDF is stored
+                kept.append(pdf_path)
+                continue
+            await asyncio.to_thread(state.ex_serv.clear_pdf, pdf_path=pdf_path)
+            # Only now may a 304 for this PDF skip downloading it again
+            await asyncio.to_thread(state.scrap_serv.save_validators, pdf_path=pdf_path)
+        return count, kept
+
+    # A failing stage cancels the other instead of leaving it blocked on the queue
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(extract())
+            stored = tg.create_task(store())
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+    return stored.result()
+
+
+async def process_upload(job_id: str, country: str):
     """
     Scrape, extract and store tariff data for a given country.
     """
-    scrap_serv.run(country=country)
-    tables = ex_serv.run(country=country)
-    ex_serv.clear_images()
+    async with upload_lock:
+        jobs[job_id]["status"] = "running"
+        try:
+            tariff_data = await asyncio.to_thread(app.state.scrap_serv.run, country=country)
+            if not tariff_data or not tariff_data.status:
+                jobs[job_id].update({"status": "failed",
+                                     "error": f"Failed to download tariff PDFs for {country}"})
+                return
+            count, kept = await run_pipeline(country=country)
+            jobs[job_id]["inserted_records"] = count
+            if kept:
+                jobs[job_id].update({"status": "partial" if count else "failed",
+                                     "error": f"{len(kept)} PDF(s) kept for a retry",
+                                     "kept_pdfs": [os.path.basename(p) for p in kept]})
+            else:
+                jobs[job_id]["status"] = "completed"
+        except Exception as e:
+            jobs[job_id].update({"status": "failed", "error": str(e)})
+        finally:
+            jobs[job_id]["finished_at"] = time.time()
+
 
-    count = 0
-    for tab in tables:
-        parsed = parser.run(ip=tab)
-        if not parsed:
-            continue
-        for i in parsed:
-            status = db.insert_record(data=i.values())
-            if status:
-                count += 1
-    return {"inserted_records": count}
+@app.post("/upload")
+async def upload_data(country: str, background_tasks: BackgroundTasks):
+    """
+    Queue scraping, extraction and storage of tariff data for a given country.
+    
+    Async so it runs on the event loop, like every other change to jobs,
+    rather than in the threadpool alongside concurrent requests.
+    """
+    expire_jobs()
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = {"country": country, "status": "queued"}
+    background_tasks.add_task(process_upload, job_id=job_id, country=country)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/upload/{job_id}")
+def upload_status(job_id: str):
+    """
+    Fetch the status of an upload job.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs[job_id]
 
 
 @app.get("/fetch")
-def fetch_records():
+def fetch_records(limit: Optional[int] = Query(None, ge=1), offset: int = Query(0, ge=0)):
     """
-    Fetch all records from the database.
+    Fetch records from the database, optionally one page at a time.
     """
-    records = db.fetch_records()
+    records = app.state.db.fetch_records(limit=limit, offset=offset)
     return {"records": records}
@@ -1,11 +1,16 @@
 import logging
+from logging.handlers import RotatingFileHandler
 
-def setup_console_and_file_logging(
-    logger_name: str = "src.services.default",
+def configure_logging(
     level: int = logging.INFO,
-    log_file: str = "app.log"
+    log_file: str = "app.log",
+    logger_name: str = "src"
 ):
-    """Sets up logging to print logs on the console and write to a log file."""
+    """Sets up logging to print logs on the console and write to a rotating log file.
+
+    Call it once from the application entry point; modules only create their
+    logger with logging.getLogger(__name__) and inherit these handlers.
+    """
     
     # Create logger
     logger = logging.getLogger(logger_name)
@@ -26,8 +31,8 @@ def setup_console_and_file_logging(
     console_handler.setFormatter(log_format)
     logger.addHandler(console_handler)
 
-    # File handler
-    file_handler = logging.FileHandler(log_file)
+    # File handler, rotated so long runs don't grow the log without bound
+    file_handler = RotatingFileHandler(log_file, maxBytes=10_000_000, backupCount=3)
     file_handler.setLevel(level)
     file_handler.setFormatter(log_format)
     logger.addHandler(file_handler)
@@ -1,32 +1,53 @@
+import os
 from dataclasses import dataclass
-from typing import Any
+from functools import lru_cache
+from typing import Any, Optional
 import yaml
 
-@dataclass
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+@lru_cache(maxsize=8)
+def _load_yaml(filepath: str, mtime: float, size: int) -> dict:
+    # mtime and size are part of the cache key so an edited file is re-read
+    with open(filepath, 'r') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+@dataclass(frozen=True, slots=True)
 class ScrapperConfig:
     url: str
     download_link: str
     output_dir: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ExtractorConfig:
     conf_thrs: float
     iou_thrs: float
     img_dir: str
     model_name: str
     model_url: str
+    batch_size: int = 8
+    dpi: int = 300
+    overlap_thrs: float = 0.5
+    imgsz: Optional[int] = None      # None keeps the size stored in the checkpoint
+    tensorrt: bool = False
+    debug_save: bool = False
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OpenaiConfig:
     model_name: str
     prompt_file: str
+    concurrency: int = 8
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SqliteConfig:
     name: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
     scrapper: ScrapperConfig
     extractor: ExtractorConfig
@@ -35,8 +56,8 @@ class Config:
 
     @classmethod
     def from_yaml(cls, filepath: str) -> "Config":
-        with open(filepath, 'r') as f:
-            data = yaml.safe_load(f)
+        stat = os.stat(filepath)
+        data = _load_yaml(filepath, stat.st_mtime, stat.st_size)
 
         return cls(scrapper=ScrapperConfig(**data["scrapper"]),
                    extractor=ExtractorConfig(**data["extractor"]),
@@ -56,11 +77,18 @@ class Config:
                 "iou_thrs" : self.extractor.iou_thrs,
                 "img_dir" : self.extractor.img_dir,
                 "model_name" : self.extractor.model_name,
-                "model_url" : self.extractor.model_url
+                "model_url" : self.extractor.model_url,
+                "batch_size" : self.extractor.batch_size,
+                "dpi" : self.extractor.dpi,
+                "overlap_thrs" : self.extractor.overlap_thrs,
+                "imgsz" : self.extractor.imgsz,
+                "tensorrt" : self.extractor.tensorrt,
+                "debug_save" : self.extractor.debug_save
             },
             "openai" : {
                 "model_name" : self.openai.model_name,
-                "prompt_file" : self.openai.prompt_file
+                "prompt_file" : self.openai.prompt_file,
+                "concurrency" : self.openai.concurrency
             },
             'database' : {
                 "name" : self.sqlite.name
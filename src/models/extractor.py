@@ -1,8 +1,14 @@
+from dataclasses import dataclass
 from typing import Any, Optional, List, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from PIL import Image
 
+# Values the LLM uses for a missing cell
+_BLANKS = frozenset((None, 'null', ''))
+
 class ShippingTariff(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True, validate_assignment=False)
+
     Country: str
     Type: str  # Inbound or outbound i.e. IB/OB
     Liner_Name: Optional[str] = None  # return null if not found in table
@@ -14,6 +20,16 @@ class ShippingTariff(BaseModel):
     Bucket_2: Optional[int] = None   # $min/$max
     Bucket_3: Optional[int] = None   # $min/$max
 
+    @field_validator('Bucket_1', 'Bucket_2', 'Bucket_3', 'Free_days', mode='before')
+    @classmethod
+    def _blank_to_none(cls, v):
+        return None if v in _BLANKS else int(v)
+
+    @field_validator('Liner_Name', 'Port', mode='before')
+    @classmethod
+    def _empty_to_none(cls, v):
+        return v or None
+
     def values(self) -> tuple:
         return (
             self.Country,
@@ -28,8 +44,10 @@ class ShippingTariff(BaseModel):
             self.Bucket_3,
         )
 
-class Table(BaseModel):
-    img: Any
+@dataclass(slots=True)
+class Table:
+    img: Any                         # PIL image, passed by reference
     pdf_file: str
     page_no: str
-    tariff: Optional[List[ShippingTariff]] = None
\ No newline at end of file
+    tariff: Optional[List[ShippingTariff]] = None
+    high_detail: bool = False        # always send to the vision model at detail "high"
@@ -1,11 +1,15 @@
 import os
 import sys
-import torch
 import requests
 import logging
-from PIL import Image
-from ultralytics import YOLO
-from pdf2image import convert_from_path
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+# torch, ultralytics and pdf2image are imported where they are used so
+# importing this module stays cheap
+if TYPE_CHECKING:
+    from ultralytics import YOLO
 
 
 cwd = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -13,15 +17,8 @@ sys.path.append(cwd)
 
 from src.models.config import Config
 from src.models.extractor import Table
-from src.logger import setup_console_and_file_logging
-
-cfg = Config.from_yaml(filepath=os.path.join(
-                cwd, 'src', 'config.yaml'
-            ))
-logger = setup_console_and_file_logging(
-                    level=logging.INFO, 
-                    logger_name=__name__
-                )
+
+logger = logging.getLogger(__name__)
 
 class Extractor:
     """
@@ -35,7 +32,7 @@ class Extractor:
         is_gpu_available (bool): Whether GPU is available for processing.
         conf_thrs (float): Confidence threshold for object detection.
         iou_thrs (float): IoU threshold for object detection.
-        output_dir (str): Directory to store extracted images.
+        output_dir (str): Directory to store page images when debug_save is enabled.
         model (YOLO): Loaded YOLO model for table detection.
     """
     def __init__(self, config: Config):
@@ -48,21 +45,44 @@ class Extractor:
         # Use provided config or import if not provided
         self.cfg = config
 
+        import torch
+
         # Check for GPU availability
         self.is_gpu_available = torch.cuda.is_available()
         logger.info(f"GPU available: {self.is_gpu_available}")
+        if self.is_gpu_available:
+            # Pages are rendered at a fixed DPI, so let cuDNN pick the fastest kernels once
+            torch.backends.cudnn.benchmark = True
+            # Allow TF32 tensor cores for FP32 matmuls
+            torch.set_float32_matmul_precision('high')
 
         # Set configuration values
         self.conf_thrs = self.cfg.extractor.conf_thrs
         self.iou_thrs = self.cfg.extractor.iou_thrs
+        self.batch_size = self.cfg.extractor.batch_size
+        self.overlap_thrs = self.cfg.extractor.overlap_thrs
+        self.imgsz = self.cfg.extractor.imgsz
 
         # Setup directories
         self.output_dir = os.path.join(cwd, self.cfg.extractor.img_dir)
-        os.makedirs(self.output_dir, exist_ok=True)
+        if self.cfg.extractor.debug_save:
+            os.makedirs(self.output_dir, exist_ok=True)
 
         # Load model
         self.model_path = os.path.join(cwd, 'assets', self.cfg.extractor.model_name)
-        _ = self.download_file()
+        if not os.path.exists(self.model_path):
+            _ = self.download_file()
+
+        # Prefer a cached TensorRT engine on GPU, rebuilding it when it is older
+        # than the weights it was exported from
+        if self.is_gpu_available and self.cfg.extractor.tensorrt:
+            engine_path = self.engine_path()
+            if not (os.path.exists(engine_path)
+                    and os.path.getmtime(engine_path) >= os.path.getmtime(self.model_path)):
+                engine_path = self.export_engine()
+            if engine_path:
+                self.model_path = engine_path
+
         logger.info(f"Loading YOLO model from: {self.model_path}")
         self.model = self.load_model(model_path=self.model_path)
     
@@ -73,64 +93,120 @@ class Extractor:
         Returns:
             bool: True if download is successful, False otherwise.
         """
+        # Weights are only downloaded when missing, so write them to a temporary
+        # file and move it into place; a failed download must not leave a
+        # truncated file that would be loaded on every later start
+        partial_path = self.model_path + '.part'
         try:
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
             with requests.get(self.cfg.extractor.model_url, stream=True) as r:
                 r.raise_for_status()
-                with open(self.model_path, 'wb') as f:
+                with open(partial_path, 'wb') as f:
                     for chunk in r.iter_content(chunk_size=8192):
                         if chunk:
                             f.write(chunk)
+            os.replace(partial_path, self.model_path)
             logger.info("Download completed: %s",self.model_path)
             return True
         except Exception as e:
             logger.error("Failed to download file: %s", e)
             return False
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
 
     def convert_pdf2img(self,
                         pdf_path: str
                     ):
         """
-        Convert PDF document to high-resolution PNG images.
+        Convert PDF document to high-resolution in-memory images.
         
         Args:
             pdf_path (str): Path to the input PDF file.
             
         Returns:
-            bool: True if conversion was successful, None if failed.
+            list: List of PIL Image objects, one per page, None if failed.
             
         Raises:
             Exception: Any error that occurs during PDF conversion.
         """
+        from pdf2image import convert_from_path
+
         try:
             logger.info("Converting PDF to images: %s", pdf_path)
 
 
             # Convert PDF to images with appropriate parameters
-            conversion_kwargs = {'dpi': 300}
+            conversion_kwargs = {
+                'dpi': self.cfg.extractor.dpi,
+                'thread_count': os.cpu_count() or 1
+            }
             images = convert_from_path(pdf_path, **conversion_kwargs)
 
-            count = 0
-            filename = os.path.basename(pdf_path).replace('.pdf', '')
-            filename = filename.replace(' ', '_')
-            for i, img in enumerate(images):
-                # Use a consistent naming convention with page numbers
-                image_path = os.path.join(
-                                    self.output_dir, 
-                                    f"{filename}_page_{i+1}.png"
-                                )
-                img.save(image_path, 'PNG')
-                count += 1
-
-            logger.info("Converted %s pages to images", count)
-            del count
-            return True
+            # Pages are only written to disk for inspection
+            if self.cfg.extractor.debug_save:
+                filename = os.path.basename(pdf_path).replace('.pdf', '')
+                filename = filename.replace(' ', '_')
+                for i, img in enumerate(images):
+                    image_path = os.path.join(
+                                        self.output_dir, 
+                                        f"{filename}_page_{i+1}.png"
+                                    )
+                    img.save(image_path, 'PNG')
+
+            logger.info("Converted %s pages to images", len(images))
+            return images
 
         except Exception as e:
             logger.error("Error converting PDF to images: %s", str(e))
             return None
 
-    def load_model(self, model_path: str) -> YOLO:
+    def engine_path(self):
+        """
+        Path of the TensorRT engine for the current image size and batch size.
+        
+        Both are baked into an engine, so they are part of its filename and a
+        config change exports a new engine instead of reusing a stale one.
+        
+        Returns:
+            str: Path to the engine file next to the weights file.
+        """
+        stem = os.path.splitext(self.model_path)[0]
+        return f"{stem}_{self.imgsz or 'default'}_b{self.batch_size}.engine"
+
+    def export_engine(self):
+        """
+        Export the YOLO weights to a TensorRT FP16 engine next to the weights file.
+        
+        The engine is built for the configured image size with a dynamic
+        batch dimension of up to batch_size pages.
+        
+        Returns:
+            str: Path to the exported engine, or None if export failed.
+        """
+        from ultralytics import YOLO
+
+        try:
+            logger.info("Exporting TensorRT engine from: %s", self.model_path)
+            export_kwargs = {
+                'format': 'engine',
+                'half': True,
+                'dynamic': True,
+                'batch': self.batch_size
+            }
+            if self.imgsz:
+                export_kwargs['imgsz'] = self.imgsz
+            exported = YOLO(self.model_path).export(**export_kwargs)
+
+            engine_path = self.engine_path()
+            os.replace(exported, engine_path)
+            logger.info("TensorRT engine saved to: %s", engine_path)
+            return engine_path
+        except Exception as e:
+            logger.error("Failed to export TensorRT engine: %s", str(e))
+            return None
+
+    def load_model(self, model_path: str) -> "YOLO":
         """
         Load and initialize the YOLO model.
         
@@ -143,8 +219,13 @@ class Extractor:
         Raises:
             Exception: Any error that occurs during model loading.
         """
+        from ultralytics import YOLO
+
         try:
-            if self.is_gpu_available:
+            if model_path.endswith('.engine'):
+                model = YOLO(model_path, task='detect')
+                logger.info("TensorRT engine loaded on GPU")
+            elif self.is_gpu_available:
                 model = YOLO(model_path).to(device='cuda')
                 logger.info("Model loaded on GPU")
             else:
@@ -156,34 +237,71 @@ class Extractor:
             return None
 
     def prediction(self,
-                   image_path: str
+                   images: list
                 ):
         """
-        Perform object detection on an image to identify tables.
+        Perform object detection on one batch of page images to identify tables.
         
         Args:
-            image_path (str): Path to the input image file.
+            images (list): PIL Image objects of the pages, at most batch_size of them.
             
         Returns:
-            object: Detection boxes from YOLO model, or None if detection failed.
+            list: Detection boxes for each image, in input order, or None if detection failed.
             
         Raises:
             Exception: Any error that occurs during prediction.
         """
+        import torch
+
         try:
-            logger.info("Running detection on: %s", image_path)
-            results = self.model(
-                image_path, 
-                conf=self.conf_thrs, 
-                iou=self.iou_thrs
-            )[0]
-            logger.info("Detection found %s potential regions", len(results.boxes))
-            return results.boxes
+            logger.info("Running detection on %s images", len(images))
+            predict_kwargs = {
+                'conf': self.conf_thrs,
+                'iou': self.iou_thrs,
+                'half': self.is_gpu_available
+            }
+            # Without an explicit size the checkpoint's own training size is used
+            if self.imgsz:
+                predict_kwargs['imgsz'] = self.imgsz
+
+            with torch.inference_mode():
+                results = self.model(images, batch=len(images), **predict_kwargs)
+            boxes = [res.boxes for res in results]
+            logger.info("Detection found %s potential regions", sum(len(b) for b in boxes))
+            return boxes
 
         except Exception as e:
             logger.error("Error during prediction: %s", str(e))
             return None
     
+    def suppress_overlaps(self, boxes, confs):
+        """
+        Drop boxes that overlap a higher-confidence box, so the same table
+        is not cropped and parsed twice.
+        
+        Args:
+            boxes (numpy.ndarray): (N, 4) array of xyxy box coordinates.
+            confs (numpy.ndarray): (N,) array of confidence scores.
+            
+        Returns:
+            numpy.ndarray: Kept boxes, ordered by descending confidence.
+        """
+        boxes = boxes[np.argsort(-confs)]
+        x1, y1, x2, y2 = boxes.T
+        areas = (x2 - x1) * (y2 - y1)
+
+        # Pairwise IoU via broadcasting
+        inter_w = np.maximum(0, np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1))
+        inter_h = np.maximum(0, np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1))
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[:, None] + areas - inter, 1)
+
+        keep = np.ones(len(boxes), dtype=bool)
+        for i in range(len(boxes)):
+            if keep[i]:
+                keep[i + 1:] &= iou[i, i + 1:] <= self.overlap_thrs
+        return boxes[keep]
+
     def extract_tables(self,
                     image,
                     detections):
@@ -195,75 +313,152 @@ class Extractor:
             detections (object): Detection boxes from the YOLO model.
             
         Returns:
-            list: List of cropped PIL Image objects containing tables,
-                 or None if no tables were found or extraction failed.
-            
-        Raises:
-            Exception: Any error that occurs during table extraction.
+            list: List of cropped PIL Image objects containing tables, empty if
+                 no tables were found, or None if extraction failed.
         """
         try:
             response = []
             # Process each detection
-            logger.info("Processing %s potential detections", len(detections))
-
-            for i, conf in enumerate(detections.conf):
-                # Skip low confidence detections
-                conf_value = conf.detach().cpu().numpy()
-                label = detections.cls.detach().cpu().numpy()
-                
-                # Check if this is a table (class 8) with sufficient confidence
-                if conf_value >= 0.2 and label[i] == 8:
-                    # Get bounding box coordinates
-                    xyxy = detections.xyxy[i].detach().cpu().numpy()
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    cropped_region = image.crop((x1, y1, x2, y2))
-                    response.append(cropped_region)
-                    # logger.info(f"Extracted table from {filename}: {x1}_{y1}_{x2}_{y2}")
+            logger.debug("Processing %s potential detections", len(detections))
+
+            # Keep tables (class 8) with sufficient confidence, filtering on the
+            # device so only the kept rows are copied to the CPU, in one transfer
+            keep = (detections.conf >= self.conf_thrs) & (detections.cls == 8)
+            kept = detections.data[keep].cpu().numpy()    # [x1, y1, x2, y2, conf, cls]
+            boxes, confs = kept[:, :4].astype(int), kept[:, 4]
+
+            kept_boxes = self.suppress_overlaps(boxes=boxes, confs=confs)
+            for x1, y1, x2, y2 in kept_boxes.tolist():
+                cropped_region = image.crop((x1, y1, x2, y2))
+                response.append(cropped_region)
             
-            # Return the list of tables if any were found, otherwise None
             if response:
                 logger.info("Extracted %s tables", len(response))
-                return response
             else:
                 logger.info("No tables found")
-                return None
+            return response
 
         except Exception as e:
             logger.error("Error extracting patches: %s",str(e))
             return None
     
-    def clear_pdfs(self, country: str):
+    def clear_pdf(self, pdf_path: str):
         """
-        Remove all PDF files for a specified country.
+        Remove a single processed PDF, and its country directory once it is empty.
         
         Args:
-            country (str): Country name, corresponding to the directory name.
+            pdf_path (str): Path to the PDF file.
+            
+        Raises:
+            OSError: If the PDF exists but could not be removed; it would otherwise
+                be processed again after its validators were saved.
         """
-        pdf_dir = os.path.join(cwd, 'downloads', country)
-        for filename in os.listdir(pdf_dir):
-            file_path = os.path.join(pdf_dir, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        try:
+            os.remove(pdf_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.rmdir(os.path.dirname(pdf_path))
+        except OSError:
+            # Other PDFs are still waiting to be processed
+            pass
+
+    def detect_tables(self, filename: str, images: list):
+        """
+        Detect and crop the tables on the pages of one PDF.
+        
+        Args:
+            filename (str): Name of the PDF the pages belong to.
+            images (list): PIL Image objects of the pages.
+            
+        Returns:
+            list: Table objects for every table found, empty if there are none,
+                 or None if detection or cropping failed on any page.
+        """
+        tables = list()
+        for start in range(0, len(images), self.batch_size):
+            batch = images[start:start + self.batch_size]
+            detections = self.prediction(images=batch)
+            if detections is None:
+                # Dropping the batch would lose its pages for good once the PDF is removed
+                logger.error('Detection failed for %s, keeping it for a retry', filename)
+                return None
+            for page, (img, dets) in enumerate(zip(batch, detections), start=start + 1):
+                crops = self.extract_tables(image=img, detections=dets)    # [PIL OBJ, PIL OBJ]
+                if crops is None:
+                    # Same as a failed detection, the page must not be dropped silently
+                    logger.error('Table extraction failed for %s page %s, keeping it for a retry',
+                                 filename, page)
+                    return None
+                tables.extend(
+                    Table(**{
+                        "img" : tab,     # PIL OBJ
+                        "pdf_file" : filename,
+                        "page_no" : f"page_{page}"
+                    })
+                    for tab in crops
+                )
+        return tables
 
-    def clear_images(self):
+    def iter_pdfs(self, country: str):
         """
-        Remove all temporary image files from the output directory.
+        Execute the extraction pipeline PDF by PDF for all PDFs of a country.
+        
+        This method:
+        1. Converts each PDF to images, rendering the next PDF in the background
+        2. Detects and extracts the tables of its pages
+        3. Yields the PDF path with its Table objects
+        
+        PDFs are left on disk; remove each one with clear_pdf once its tables
+        are stored, so a failed PDF is retried on the next run.
+        
+        Args:
+            country (str): Country name, used to locate PDF files.
+            
+        Yields:
+            tuple: (pdf_path, tables), tables is None if the PDF could not be processed.
         """
-        for filename in os.listdir(self.output_dir):
-            file_path = os.path.join(self.output_dir, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        pdf_dir = os.path.join(cwd, 'downloads', country)
+        if not os.path.isdir(pdf_dir):
+            logger.info('No PDFs found for %s', country)
+            return
 
+        # scandir yields name and path together, without a stat per entry
+        pdf_files = sorted(
+            (entry.name, entry.path) for entry in os.scandir(pdf_dir)
+            if entry.name.endswith('.pdf') and entry.is_file()
+        )
+
+        # Rasterize the next PDF in a worker thread (poppler runs as subprocesses)
+        # while YOLO processes the current one. Only one PDF is rendered ahead,
+        # so at most two PDFs worth of pages are held in memory
+        count = 0
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = None
+            if pdf_files:
+                future = pool.submit(self.convert_pdf2img, pdf_path=pdf_files[0][1])
+            for i, (filename, file_path) in enumerate(pdf_files):
+                images = future.result()
+                if i + 1 < len(pdf_files):
+                    future = pool.submit(self.convert_pdf2img, pdf_path=pdf_files[i + 1][1])
+
+                if images is None:
+                    logger.info('Failed to convert %s to images', filename)
+                    tables = None
+                else:
+                    tables = self.detect_tables(filename=filename, images=images)
+                    count += len(tables or [])
+                # Only the cropped tables are needed from here on
+                del images
+                yield file_path, tables
+
+        if count == 0:
+            logger.info('No table found')
 
     def run(self, country: str):
         """
         Execute the complete extraction pipeline for all PDFs of a country.
         
-        This method:
-        1. Converts all PDFs to images
-        2. Detects and extracts tables from each image
-        3. Creates Table objects with extracted information
-        
         Args:
             country (str): Country name, used to locate PDF files.
             
@@ -271,49 +466,7 @@ class Extractor:
             list: List of Table objects containing extracted tables,
                  or empty list if no tables were found or extraction failed.
         """
-        pdf_dir = os.path.join(cwd, 'downloads', country)
-        conv_status = list()
-        for filename in os.listdir(pdf_dir):
-            if filename.endswith('.pdf'):
-                file_path = os.path.join(pdf_dir, filename)
-                temp = self.convert_pdf2img(pdf_path=file_path)
-            else:
-                temp = False
-            conv_status.append(temp)
-
-        ## if conversion successfull
         result = list()
-        if all(conv_status):
-            self.clear_pdfs(country=country)
-            for filename in os.listdir(self.output_dir):    # [pdf_file_basename_page_1.png]
-                img_path = os.path.join(self.output_dir, filename)
-                if img_path.endswith('.png'):
-                    img = Image.open(img_path)
-                    dets = self.prediction(image_path=img_path)
-                    tables = self.extract_tables(image=img, detections=dets)    # [PIL OBJ, PIL OBJ]
-                    if tables is not None:
-                        if len(tables) > 1:
-                            for tab in tables:
-                                table_info = {
-                                    "img" : tab,     # PIL OBJ
-                                    "pdf_file" : f"{filename[:-10]}.pdf",
-                                    "page_no" : f"{filename[-10:].replace('.png', '')}"
-                                }
-                                result.append(Table(**table_info))
-                        else:
-                            result.append(Table(**{
-                                "img" : tables[0],     # PIL OBJ
-                                "pdf_file" : f"{filename[:-10]}.pdf",
-                                "page_no" : f"{filename[-10:].replace('.png', '')}"
-                            }))
-
-                    else:
-                        logger.info('No tables found')
-                else:
-                    logger.info('Invalid Input')
-            
-            if len(result) == 0:
-                logger.info('No table found')
-        else:
-            logger.info('Failed to convert to images')
+        for _, tables in self.iter_pdfs(country=country):
+            result.extend(tables or [])
         return result
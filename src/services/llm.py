@@ -1,12 +1,15 @@
 import os
 import sys
 import json
+import asyncio
 import base64
 import logging
+from functools import lru_cache
 from PIL import Image
 from io import BytesIO
-from openai import OpenAI
-from typing import Dict, Any, Union
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from typing import Dict, Any, Union, List, Optional, Tuple
 
 
 cwd = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -14,13 +17,105 @@ sys.path.append(cwd)
 
 from src.models.config import Config
 from src.models.extractor import Table, ShippingTariff
-from src.logger import setup_console_and_file_logging
 
-logger = setup_console_and_file_logging(level=logging.INFO,
-                                        logger_name=__name__)
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 # load_dotenv(os.path.join(cwd, '.env'))
 
+# Image budget for the vision model. Longest edge, in pixels, of images
+# sent; GPT-4o rescales larger images anyway, so extra pixels only cost
+# upload time
+MAX_EDGE = 1536
+# Images that fit within this edge lose nothing at detail "low", which
+# costs a fixed, small number of tokens
+LOW_DETAIL_EDGE = 512
+JPEG_QUALITY = 85
+# Attempts after the first for transient OpenAI failures
+MAX_RETRIES = 3
+
+
+@lru_cache(maxsize=4)
+def _load_prompt(path: str) -> str:
+    """
+    Read a prompt file once per process.
+    
+    Args:
+        path (str): Path to the prompt file.
+        
+    Returns:
+        str: The prompt text.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=4)
+def _get_openai_clients(api_key: str, concurrency: int) -> Tuple[OpenAI, AsyncOpenAI]:
+    """
+    Create the sync and async OpenAI clients once per key and pool size.
+    
+    Both clients keep pooled HTTP/2 connections that are reused by every
+    ParseTables instance sharing them, and retry rate limits, connection
+    errors and 5xx responses with jittered exponential backoff.
+    
+    Args:
+        api_key (str): OpenAI API key.
+        concurrency (int): Maximum number of concurrent requests per client.
+        
+    Returns:
+        tuple: (OpenAI, AsyncOpenAI) clients.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    client = OpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        http_client=DefaultHttpxClient(http2=True, limits=limits)
+    )
+    aclient = AsyncOpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(http2=True, limits=limits)
+    )
+    return client, aclient
+
+
+def _tariff_records(json_obj: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Pick the list of tariff records out of a JSON mode response.
+    
+    The prompt asks for {"tariffs": [...]}, but JSON mode only guarantees some
+    JSON value, so a bare list or an object with a single list-valued key is
+    accepted as well.
+    
+    Args:
+        json_obj: Decoded response content.
+        
+    Returns:
+        list: Tariff records, or None if the response has no recognisable list
+              of records, so the table counts as failed rather than empty.
+    """
+    if isinstance(json_obj, list):
+        return json_obj
+    if not isinstance(json_obj, dict):
+        logger.error("Response is not a JSON object: %s", type(json_obj).__name__)
+        return None
+    if isinstance(json_obj.get("tariffs"), list):
+        return json_obj["tariffs"]
+
+    lists = [v for v in json_obj.values() if isinstance(v, list)]
+    if len(lists) == 1:
+        logger.warning("Response has no \"tariffs\" key, using its only list: %s", list(json_obj))
+        return lists[0]
+    logger.error("Response has no \"tariffs\" list, keys: %s", list(json_obj))
+    return None
+
+
 class ParseTables:
     """
     Parse table images using OpenAI vision model.
@@ -33,6 +128,8 @@ class ParseTables:
         model_name (str): Name of the OpenAI model to use.
         prompt (str): The prompt text loaded from the prompt file.
         client (OpenAI): OpenAI client instance.
+        aclient (AsyncOpenAI): Async OpenAI client instance for concurrent requests.
+        concurrency (int): Maximum number of concurrent OpenAI requests.
     """
     def __init__(self, config: Config):
         """
@@ -44,12 +141,12 @@ class ParseTables:
         logger.info("Initializing ParseTables with configuration")
         self.prompt_path = os.path.join(cwd, 'assets', config.openai.prompt_file)
         self.model_name = config.openai.model_name
+        self.concurrency = config.openai.concurrency
 
          # Load prompt from file
         if self.prompt_path.endswith('.txt'):
             try:
-                with open(self.prompt_path, 'r', encoding='utf-8') as f:
-                    self.prompt = f.read()
+                self.prompt = _load_prompt(self.prompt_path)
                 logger.info("Successfully loaded prompt from %s", self.prompt_path)
             except Exception as e:
                 logger.error("Failed to read prompt file: %s", str(e))
@@ -64,17 +161,22 @@ class ParseTables:
         if not api_key:
             logger.error("OPENAI environment variable not set")
             self.client = None
+            self.aclient = None
         else:
             try:
-                self.client = OpenAI(api_key=api_key)
+                self.client, self.aclient = _get_openai_clients(api_key, self.concurrency)
                 logger.info("Successfully initialized OpenAI client")
             except Exception as e:
                 logger.error("Failed to initialize OpenAI client: %s", str(e))
                 self.client = None
+                self.aclient = None
     
     def pil_to_base64(self, image: Image.Image) -> str:
         """
-        Convert a PIL Image to base64 string for API transmission.
+        Convert a PIL Image to a base64 grayscale JPEG string for API transmission.
+        
+        Images larger than MAX_EDGE on their longest side are downscaled first.
+        Only the text of the table is needed, so colour is dropped.
         
         Args:
             image (Image.Image): PIL Image object to convert.
@@ -86,114 +188,205 @@ class ParseTables:
             IOError: If image conversion fails.
         """
         try:
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            if max(image.size) > MAX_EDGE:
+                scale = MAX_EDGE / max(image.size)
+                size = (round(image.width * scale), round(image.height * scale))
+                image = image.resize(size, Image.Resampling.LANCZOS)
+            if image.mode != "L":
+                image = image.convert("L")
+
+            with BytesIO() as buffered:
+                image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+                # getbuffer() is a view of the encoded bytes, getvalue() would copy them
+                with buffered.getbuffer() as view:
+                    img_str = base64.b64encode(view).decode("ascii")
             return img_str
         except Exception as e:
             logger.error("Failed to convert image to base64: %s", str(e))
             return None
     
-    def run(self, ip: Table):
+    def _validate(self, ip: Table, client) -> bool:
         """
-        Process a table image and extract structured data.
-        
-        This method sends the table image to OpenAI's vision model and
-        parses the response into structured shipping tariff data.
+        Check that the prompt, client and input image are usable.
         
         Args:
             ip (Table): Table object containing the image to process.
+            client: OpenAI client the request will be sent with.
             
         Returns:
-            list: List of ShippingTariff objects if successful, None otherwise.
-            
-        Raises:
-            ValueError: If input validation fails.
-            RuntimeError: If API request or processing fails.
+            bool: True if the table can be processed, False otherwise.
         """
         logger.info("Processing table from %s, page %s", getattr(ip, 'pdf_file', 'unknown'), getattr(ip, 'page_no', 'unknown'))
         
         # Validate inputs
         if not self.prompt:
             logger.error("No prompt available. Cannot process table")
-            return None
+            return False
             
-        if not self.client:
+        if not client:
             logger.error("No OpenAI client available. Cannot process table")
-            return None
+            return False
             
         if not hasattr(ip, 'img') or not isinstance(ip.img, Image.Image):
             logger.error("Invalid input: not a PIL Image")
+            return False
+        return True
+
+    def _build_messages(self, ip: Table) -> list:
+        """
+        Build the chat messages carrying the prompt and the encoded table image.
+        
+        Args:
+            ip (Table): Table object containing the image to process.
+            
+        Returns:
+            list: Messages for the chat completions API.
+        """
+        # Convert image to base64
+        logger.debug("Converting image to base64")
+        enc_img = self.pil_to_base64(image=ip.img)
+        small = max(ip.img.size) <= LOW_DETAIL_EDGE
+        detail = "low" if small and not ip.high_detail else "high"
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text", 
+                        "text": self.prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{enc_img}",
+                            "detail": detail
+                        }
+                    }
+                ]
+            }
+        ]
+
+    def _parse_response(self, response) -> Optional[List[ShippingTariff]]:
+        """
+        Parse an OpenAI chat completion into shipping tariff records.
+        
+        Args:
+            response: Chat completion returned by the OpenAI API.
+            
+        Returns:
+            list: List of ShippingTariff objects if successful, None otherwise.
+        """
+        logger.debug("Received response from OpenAI API")
+
+        # Extract response text
+        if hasattr(response, 'choices') and len(response.choices) > 0:
+            response_text = response.choices[0].message.content
+        else:
+            logger.error("Unexpected response format from OpenAI API")
             return None
+
+        # JSON mode guarantees a bare JSON object: {"tariffs": [...]}
+        json_str = response_text
+        logger.debug("Parsing JSON response")
         
         try:
-            # Convert image to base64
-            logger.debug("Converting image to base64")
-            enc_img = self.pil_to_base64(image=ip.img)
+            records = _tariff_records(_loads(json_str))
+            if records is None:
+                return None
+            resp = []
+            for i in records:
+                try:
+                    # Blank values and type casting are handled by the model validators
+                    resp.append(ShippingTariff(**i))
+                except Exception as e:
+                    logger.warning("Skipping invalid record due to parsing error: %s", str(e))
+            logger.info("Successfully extracted %d tariff entries", len(resp))
+            return resp
+        except json.JSONDecodeError as e:
+            logger.error("Failed to parse JSON response: %s", str(e))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response content: %s", json_str[:500] + "..." if len(json_str) > 500 else json_str)
+            return None
+        except Exception as e:
+            logger.error("Error creating ShippingTariff objects: %s", str(e))
+            return None
+
+    def run(self, ip: Table):
+        """
+        Process a table image and extract structured data.
+        
+        This method sends the table image to OpenAI's vision model and
+        parses the response into structured shipping tariff data.
+        
+        Args:
+            ip (Table): Table object containing the image to process.
+            
+        Returns:
+            list: List of ShippingTariff objects if successful, None otherwise.
+        """
+        if not self._validate(ip=ip, client=self.client):
+            return None
+        
+        try:
+            messages = self._build_messages(ip=ip)
             
             # Call OpenAI API
             logger.info("Sending request to OpenAI API (model: %s)", self.model_name)
             response = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text", 
-                                "text": self.prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{enc_img}"
-                                }
-                            }
-                        ]
-                    }
-                ]
+                messages=messages,
+                response_format={"type": "json_object"}
             )
-            logger.debug("Received response from OpenAI API")
-
-            # Extract response text
-            if hasattr(response, 'choices') and len(response.choices) > 0:
-                response_text = response.choices[0].message.content
-            else:
-                logger.error("Unexpected response format from OpenAI API")
-                return None
+            return self._parse_response(response=response)
+                
+        except Exception as e:
+            logger.error("Error processing table: %s", str(e))
+            return None
 
-            # Clean and parse JSON response
-            json_str = response_text.replace('```json', '').replace('```', '').strip()
-            logger.debug("Parsing JSON response")
+    async def arun(self, ip: Table):
+        """
+        Async variant of run, using the async OpenAI client.
+        
+        Args:
+            ip (Table): Table object containing the image to process.
             
-            try:
-                json_obj = json.loads(json_str)
-                resp = []
-                for i in json_obj:
-                    try:
-                        # Explicit type casting to handle unexpected types
-                        i["Bucket_1"] = int(i["Bucket_1"]) if i.get("Bucket_1") not in [None, "null", ""] else None
-                        i["Bucket_2"] = int(i["Bucket_2"]) if i.get("Bucket_2") not in [None, "null", ""] else None
-                        i["Bucket_3"] = int(i["Bucket_3"]) if i.get("Bucket_3") not in [None, "null", ""] else None
-                        i["Free_days"] = int(i["Free_days"]) if i.get("Free_days") is not None else None
-
-                        # Normalize missing values
-                        i["Liner_Name"] = i.get("Liner_Name") or None
-                        i["Port"] = i.get("Port") or None
-
-                        resp.append(ShippingTariff(**i))
-                        logger.info("Successfully extracted %d tariff entries", len(resp))
-                    except Exception as e:
-                        logger.warning("Skipping invalid record due to parsing error: %s", str(e))
-                return resp
-            except json.JSONDecodeError as e:
-                logger.error("Failed to parse JSON response: %s", str(e))
-                logger.debug("Response content: %s", json_str[:500] + "..." if len(json_str) > 500 else json_str)
-                return None
-            except Exception as e:
-                logger.error("Error creating ShippingTariff objects: %s", str(e))
-                return None
+        Returns:
+            list: List of ShippingTariff objects if successful, None otherwise.
+        """
+        if not self._validate(ip=ip, client=self.aclient):
+            return None
+        
+        try:
+            # Encoding is CPU-bound, keep it off the event loop
+            messages = await asyncio.to_thread(self._build_messages, ip=ip)
+            
+            # Call OpenAI API
+            logger.info("Sending request to OpenAI API (model: %s)", self.model_name)
+            response = await self.aclient.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return self._parse_response(response=response)
                 
         except Exception as e:
             logger.error("Error processing table: %s", str(e))
             return None
+
+    async def run_many(self, tables: List[Table]):
+        """
+        Process several tables concurrently, at most self.concurrency at a time.
+        
+        Args:
+            tables (list): Table objects to process.
+            
+        Returns:
+            list: Result of arun for each table, in input order.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _bounded(ip: Table):
+            async with semaphore:
+                return await self.arun(ip=ip)
+
+        return await asyncio.gather(*[_bounded(t) for t in tables])
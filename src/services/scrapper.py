@@ -1,9 +1,16 @@
 import os
 import sys
+import json
 import time
+import shutil
 import requests
 import logging
-from typing import List, Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from typing import List, Optional, Dict, Any, Tuple
 
 
 cwd = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -11,14 +18,91 @@ sys.path.append(cwd)
 
 from src.models.config import Config
 from src.models.scrapper import TariffEntry
-from src.logger import setup_console_and_file_logging
+from src.services.sqlite import TariffDB
 
-cfg = Config.from_yaml(filepath=os.path.join(
-                cwd, 'src', 'config.yaml'
-            ))
+logger = logging.getLogger(__name__)
 
-logger = setup_console_and_file_logging(level=logging.INFO,
-                                        logger_name=__name__)
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that throttles outgoing requests.
+    
+    Requests only wait when the bucket is empty or while a cooldown imposed by
+    the server (HTTP 429/403) is active.
+    """
+
+    def __init__(self, rate: float, burst: int, max_backoff: float = 60.0):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens the bucket holds
+            max_backoff: Upper bound in seconds for the exponential cooldown
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_backoff = max_backoff
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cooldown_until = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+
+    def consume(self, tokens: int = 1) -> None:
+        """
+        Block until the requested number of tokens is available and take them.
+        
+        Args:
+            tokens: Number of tokens to take
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._cooldown_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = max(self._cooldown_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def penalize(self, retry_after: Optional[str] = None) -> float:
+        """
+        Pause the bucket after the server pushed back.
+        
+        Args:
+            retry_after: Value of the Retry-After header, doubles the previous cooldown if missing
+            
+        Returns:
+            Cooldown applied in seconds
+        """
+        with self._lock:
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = max(self._backoff * 2, 1.0)
+            self._backoff = min(delay, self.max_backoff)
+            self._cooldown_until = time.monotonic() + self._backoff
+            return self._backoff
+
+    def reset(self) -> None:
+        """Clear the exponential cooldown after a successful request."""
+        with self._lock:
+            self._backoff = 0.0
+
+
+# Shared by every Scraper so concurrent jobs respect the same request budget
+_rate = TokenBucket(rate=1 / 3, burst=5)
 
 
 class Scraper:
@@ -28,13 +112,20 @@ class Scraper:
     This class handles fetching tariff information and downloading associated PDF files.
     """
 
-    def __init__(self):
+    def __init__(self, config: Config, session: Optional[requests.Session] = None,
+                 db: Optional[TariffDB] = None):
         """
         Initialize the scraper with request headers and output directory.
         
         Args:
-            output_dir: Directory where PDFs will be saved, defaults to ./downloads
+            config: Configuration object containing scraper settings
+            session: HTTP session reused for tariff info requests, the retrying adapter is mounted on it;
+                     a new one is created if not provided
+            db: Database remembering PDF validators for conditional downloads, disabled if not provided
         """
+        self.cfg = config
+        self._db = db
+
         self._request_header = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                 "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -54,14 +145,77 @@ class Scraper:
                     like Gecko) Chrome/135.0.0.0 Safari/537.36 Edg/135.0.0.0"
             }
 
+        # Pooled sessions, so keep-alive connections and TLS sessions are reused.
+        # Info requests keep the library default headers, as before pooling
+        self._session = self._build_session(session=session)
+        self._download_session = self._build_session(headers=self._download_header)
 
         # Set up output directory
-        self.output_dir = cfg.scrapper.output_dir
+        self.output_dir = self.cfg.scrapper.output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # Tariff info by country as (fetched at, entry), reused for a few minutes
+        self._info_cache: Dict[str, Tuple[float, TariffEntry]] = dict()
+        self._info_ttl = 300
+
+        # Validators of downloaded PDFs by path, as (uuid, etag, last modified),
+        # saved only once the PDF's rows are stored
+        self._pending_validators: Dict[str, Tuple[str, Optional[str], Optional[str]]] = dict()
+
+    def _build_session(self, headers: Optional[Dict[str, str]] = None,
+                       session: Optional[requests.Session] = None) -> requests.Session:
+        """
+        Set up an HTTP session with a connection pool that retries transient failures.
+        
+        Args:
+            headers: Default headers sent with every request of the session
+            session: Existing session to configure, a new one is created if not provided
+            
+        Returns:
+            Configured requests.Session
+        """
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False    # hand the last response back for status handling
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+
+        session = session or requests.Session()
+        session.headers.update(headers or {})
+        session.mount("https://", adapter)
+        return session
+
+    def cache_clear(self) -> None:
+        """Drop all cached tariff info so the next lookups hit the API."""
+        self._info_cache.clear()
+
     def fetch_tariff_info(self, country: str) -> Optional[TariffEntry]:
         """
-        Fetch tariff information for a specific country.
+        Fetch tariff information for a specific country, reusing a recent result.
+        
+        Args:
+            country: The country to fetch tariff information for
+            
+        Returns:
+            TariffEntry object if successful, None otherwise
+        """
+        cached = self._info_cache.get(country)
+        if cached and time.monotonic() - cached[0] < self._info_ttl:
+            logger.info("Using cached tariff info for %s", country)
+            return cached[1]
+
+        tariff_data = self._fetch_tariff_info(country=country)
+        if tariff_data:
+            self._info_cache[country] = (time.monotonic(), tariff_data)
+        return tariff_data
+
+    def _fetch_tariff_info(self, country: str) -> Optional[TariffEntry]:
+        """
+        Request tariff information for a specific country from the API.
         
         Args:
             country: The country to fetch tariff information for
@@ -71,11 +225,15 @@ class Scraper:
         """
         try:
             timestamp = int(time.time() * 1000)
-            info_url = f"{cfg.scrapper.url}?country={country}&timestamp={timestamp}"
+            info_url = f"{self.cfg.scrapper.url}?country={country}&timestamp={timestamp}"
 
 
             logger.info("Fetching tariff info for %s from %s", country, info_url)
-            info_resp = requests.get(url=info_url, timeout=60)
+            _rate.consume()
+            info_resp = self._session.get(url=info_url, timeout=60)
+
+            if info_resp.status_code == 429:
+                _rate.penalize(info_resp.headers.get("Retry-After"))
 
             if info_resp.status_code != 200 and info_resp.status_code != 403:
                 logger.error("Failed to fetch tariff info for %s. Status code: %s",
@@ -83,6 +241,9 @@ class Scraper:
                 return None
 
             if info_resp.status_code == 403:
+                delay = _rate.penalize(info_resp.headers.get("Retry-After"))
+                logger.warning("Tariff info request for %s was refused, retrying in %.1fs",
+                               country, delay)
                 headers = {
                         "Accept": "application/json",
                         "Connection": "keep-alive",
@@ -93,9 +254,18 @@ class Scraper:
                         "X-Frame-Options": "ALLOWALL",
                         "User-Agent": "Mozilla/5.0",  # Add a user-agent for compatibility
                     }
-                info_resp = requests.get(url=info_url, headers=headers, timeout=60)
+                _rate.consume()
+                info_resp = self._session.get(url=info_url, headers=headers, timeout=60)
 
-            data = info_resp.json()
+                if info_resp.status_code in (403, 429):
+                    _rate.penalize(info_resp.headers.get("Retry-After"))
+
+            # Only a success clears the backoff
+            if info_resp.status_code == 200:
+                _rate.reset()
+
+            # Parse the raw bytes directly, skipping requests' charset detection
+            data = _loads(info_resp.content)
 
             # Check if we got a valid response code from the API
             if data.get('code') != '200':
@@ -122,6 +292,57 @@ class Scraper:
             logger.error("Unexpected error fetching tariff info for %s: %s", country, str(e))
             return None
 
+    def _conditional_headers(self, pdf_uuid: str) -> Dict[str, str]:
+        """
+        Build If-None-Match / If-Modified-Since headers from the last download of a PDF.
+        
+        Args:
+            pdf_uuid: UUID of the PDF to download
+            
+        Returns:
+            Dictionary of conditional headers, empty if the PDF was never downloaded
+        """
+        validators = self._db.get_pdf_validators(pdf_uuid) if self._db else None
+        if not validators:
+            return dict()
+
+        etag, last_modified = validators
+        headers = dict()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _remember_validators(self, pdf_uuid: str, output_path: str,
+                             response: requests.Response) -> None:
+        """
+        Hold the ETag and Last-Modified of a downloaded PDF until its rows are stored.
+        
+        Args:
+            pdf_uuid: UUID of the downloaded PDF
+            output_path: Path the PDF was saved to
+            response: Response the PDF was downloaded from
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self._db and (etag or last_modified):
+            self._pending_validators[os.path.realpath(output_path)] = (pdf_uuid, etag, last_modified)
+
+    def save_validators(self, pdf_path: str) -> None:
+        """
+        Persist the validators of a PDF once all of its rows are stored.
+        
+        A 304 for those validators then skips the download, so they must not be
+        saved for a PDF whose tables failed and that is kept for a retry.
+        
+        Args:
+            pdf_path: Path of the stored PDF
+        """
+        pending = self._pending_validators.pop(os.path.realpath(pdf_path), None)
+        if pending:
+            self._db.save_pdf_validators(*pending)
+
     def download_pdf(self, pdf_uuid: str, output_path: str) -> bool:
         """
         Download a PDF file by its UUID.
@@ -135,36 +356,55 @@ class Scraper:
         """
         try:
             timestamp = int(time.time() * 1000)
-            pdf_url = f"{cfg.scrapper.download_link}?id={pdf_uuid}&timestamp={timestamp}"
+            pdf_url = f"{self.cfg.scrapper.download_link}?id={pdf_uuid}&timestamp={timestamp}"
 
             logger.info("Downloading PDF from %s to %s", pdf_url, output_path)
 
-            response = requests.get(
+            _rate.consume()
+            # The context manager hands the pooled connection back on every return path
+            with self._download_session.get(
                 url=pdf_url,
-                headers=self._download_header,
+                headers=self._conditional_headers(pdf_uuid),
                 timeout=30,
                 stream=True  # Stream the response for large files
-            )
-
-            if response.status_code != 200:
-                logger.error("Failed to download PDF. Status code: %s", response.status_code)
-                return False
-
-            # Check if content is actually a PDF
-            if response.headers.get('content-type') != 'application/*;charset=utf-8':
-                logger.error("Downloaded content is not a PDF: %s",
-                             response.headers.get('content-type'))
-                return False
-
-            # Write the PDF content to file
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            ) as response:
+
+                # Validators are only saved once a PDF's rows are stored, so an
+                # unchanged PDF needs nothing written
+                if response.status_code == 304:
+                    logger.info("PDF not modified since last download, skipping %s", output_path)
+                    return True
+
+                if response.status_code != 200:
+                    if response.status_code in (403, 429):
+                        _rate.penalize(response.headers.get("Retry-After"))
+                    logger.error("Failed to download PDF. Status code: %s", response.status_code)
+                    return False
+
+                # Check if content is actually a PDF
+                if response.headers.get('content-type') != 'application/*;charset=utf-8':
+                    logger.error("Downloaded content is not a PDF: %s",
+                                 response.headers.get('content-type'))
+                    return False
+
+                # Stream the body to a temporary file in 1 MiB blocks, then move it into
+                # place so a crash never leaves a half written PDF behind
+                partial_path = output_path + ".part"
+                response.raw.decode_content = True
+                try:
+                    with open(partial_path, "wb") as f:
+                        shutil.copyfileobj(response.raw, f, 1024 * 1024)
+                    os.replace(partial_path, output_path)
+                finally:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                self._remember_validators(pdf_uuid, output_path, response)
 
             logger.info("Successfully downloaded PDF to %s", output_path)
             return True
 
-        except requests.RequestException as e:
+        except (requests.RequestException, Urllib3HTTPError) as e:
+            # urllib3 errors surface unwrapped while the raw body is being read
             logger.error("Request error downloading PDF: %s", str(e))
             return False
         except IOError as e:
@@ -193,19 +433,25 @@ class Scraper:
         country_dir = os.path.join(self.output_dir,tariff_data.country)
         os.makedirs(country_dir, exist_ok=True)
 
-        # Download inbound PDF
-        if tariff_data.inIddsPdfUuid:
-            inbound_path = os.path.join(country_dir, tariff_data.inPdfName)
-            results["inbound"] = self.download_pdf(tariff_data.inIddsPdfUuid, inbound_path)
-        else:
-            logger.warning("No inbound PDF UUID for %s", tariff_data.country)
+        # Download inbound and outbound PDFs concurrently, both are network bound
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = dict()
 
-        # Download outbound PDF
-        if tariff_data.outIddsPdfUuid:
-            outbound_path = os.path.join(country_dir, tariff_data.outPdfName)
-            results["outbound"] = self.download_pdf(tariff_data.outIddsPdfUuid, outbound_path)
-        else:
-            logger.warning("No outbound PDF UUID for %s", tariff_data.country)
+            if tariff_data.inIddsPdfUuid:
+                inbound_path = os.path.join(country_dir, tariff_data.inPdfName)
+                futures["inbound"] = executor.submit(self.download_pdf,
+                                                     tariff_data.inIddsPdfUuid, inbound_path)
+            else:
+                logger.warning("No inbound PDF UUID for %s", tariff_data.country)
+
+            if tariff_data.outIddsPdfUuid:
+                outbound_path = os.path.join(country_dir, tariff_data.outPdfName)
+                futures["outbound"] = executor.submit(self.download_pdf,
+                                                      tariff_data.outIddsPdfUuid, outbound_path)
+            else:
+                logger.warning("No outbound PDF UUID for %s", tariff_data.country)
+
+            results.update({direction: future.result() for direction, future in futures.items()})
 
         return results
 
@@ -220,7 +466,6 @@ class Scraper:
             Dictionary with results for each country
         """
         results = dict()
-        time.sleep(30)
         logger.info("Processing country: %s", country)
         results[country] = {
                                 "status": "failure",
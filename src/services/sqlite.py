@@ -2,17 +2,9 @@ import os
 import sys
 import sqlite3
 import logging
-from typing import Optional, List, Tuple, Any
-
-# Setup logging to a file
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='app.log',        # Logs will be saved to 'app.log'
-    filemode='a'               # Append mode (use 'w' to overwrite on each run)
-)
-
-logger = logging.getLogger(__name__)
+import threading
+from functools import lru_cache
+from typing import Optional, List, Tuple, Any, Iterator
 
 # Set project root path
 cwd = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -20,9 +12,76 @@ sys.path.append(cwd)
 
 from src.models.config import Config
 
-cfg = Config.from_yaml(filepath=os.path.join(
-                cwd, 'src', 'config.yaml'
-            ))
+logger = logging.getLogger(__name__)
+
+
+# SQL statements are module constants for readability; sqlite3 caches
+# prepared statements by SQL text either way
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS shipping_tariffs (
+        Type VARCHAR(255),
+        Country VARCHAR(255),
+        "Liner Name" VARCHAR(255),
+        Port VARCHAR(255),
+        "Equipment Type" VARCHAR(255),
+        Currency VARCHAR(10),
+        "Free days" INTEGER NULL,
+        "Bucket 1" VARCHAR(255) NULL,
+        "Bucket 2" VARCHAR(255) NULL,
+        "Bucket 3" VARCHAR(255) NULL
+    );
+    """
+
+_CREATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_tariffs_country ON shipping_tariffs(Country);
+    """
+
+_INSERT_SQL = """
+    INSERT INTO shipping_tariffs (
+        Country,
+        Type,
+        "Liner Name",
+        Port,
+        "Equipment Type",
+        Currency,
+        "Free days",
+        "Bucket 1",
+        "Bucket 2",
+        "Bucket 3"
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+    """
+
+_SELECT_ALL_SQL = """
+    SELECT *
+    FROM shipping_tariffs
+    ORDER BY rowid
+    LIMIT ? OFFSET ?;
+    """
+
+_SELECT_BY_COUNTRY_SQL = """
+    SELECT *
+    FROM shipping_tariffs
+    WHERE Country = ?;
+    """
+
+_CREATE_PDF_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS pdf_cache (
+        pdf_uuid VARCHAR(255) PRIMARY KEY,
+        etag VARCHAR(255) NULL,
+        last_modified VARCHAR(255) NULL
+    );
+    """
+
+_SELECT_PDF_CACHE_SQL = """
+    SELECT etag, last_modified
+    FROM pdf_cache
+    WHERE pdf_uuid = ?;
+    """
+
+_UPSERT_PDF_CACHE_SQL = """
+    INSERT OR REPLACE INTO pdf_cache (pdf_uuid, etag, last_modified)
+    VALUES (?, ?, ?);
+    """
 
 
 class TariffDB:
@@ -36,8 +95,12 @@ class TariffDB:
             config: Configuration object containing database settings
         """
         self.db_path = os.path.join(cwd, config.sqlite.name)
-        if not os.path.exists(self.db_path):
-            self.create_db()
+        self._lock = threading.Lock()
+        self._conn = self._get_connection()
+        self.create_db()
+
+        # Per instance cache of country lookups, cleared whenever records are inserted
+        self._query_cached = lru_cache(maxsize=256)(self._query_country)
             
         logger.info("Database initialized at: %s", self.db_path)
 
@@ -45,10 +108,31 @@ class TariffDB:
         """
         Create and return a database connection.
         
+        The connection is in autocommit mode and is shared by all methods,
+        so transactions are opened explicitly where needed.
+        
         Returns:
             SQLite connection object
         """
-        return sqlite3.connect(database=self.db_path)
+        conn = sqlite3.connect(
+            database=self.db_path,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-65536;")
+        conn.execute("PRAGMA mmap_size=268435456;")
+        return conn
+
+    def close(self) -> None:
+        """
+        Close the shared database connection.
+        """
+        with self._lock:
+            self._conn.close()
+        logger.info("Database connection closed")
 
     def create_db(self) -> bool:
         """
@@ -57,60 +141,61 @@ class TariffDB:
         Returns:
             bool: True if successful, False if an error occurred
         """
-        query = """
-        CREATE TABLE IF NOT EXISTS shipping_tariffs (
-            Type VARCHAR(255),
-            Country VARCHAR(255),
-            "Liner Name" VARCHAR(255),
-            Port VARCHAR(255),
-            "Equipment Type" VARCHAR(255),
-            Currency VARCHAR(10),
-            "Free days" INTEGER NULL,
-            "Bucket 1" VARCHAR(255) NULL,
-            "Bucket 2" VARCHAR(255) NULL,
-            "Bucket 3" VARCHAR(255) NULL
-        );
-        """
-        conn = None
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query)
-            conn.commit()
+            with self._lock:
+                self._conn.execute(_CREATE_TABLE_SQL)
+                self._conn.execute(_CREATE_INDEX_SQL)
+                self._conn.execute(_CREATE_PDF_CACHE_SQL)
             logger.info("Database table created successfully")
             return True
         except Exception as e:
             logger.error("Error creating database: %s", str(e))
             return False
+
+    def iter_records(self, limit: Optional[int] = None, offset: int = 0,
+                     batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Stream records from the shipping_tariffs table without loading them all at once.
+        
+        Args:
+            limit: Maximum number of records to return, all records if None
+            offset: Number of records to skip
+            batch_size: Number of rows fetched from SQLite per round trip
+            
+        Yields:
+            Record tuples
+        """
+        with self._lock:
+            cursor = self._conn.execute(_SELECT_ALL_SQL, (-1 if limit is None else limit, offset))
+        try:
+            while True:
+                # Only hold the lock per batch so writers are not blocked by slow consumers
+                with self._lock:
+                    batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
         finally:
-            if conn:
-                conn.close()
+            cursor.close()
 
-    def fetch_records(self) -> Optional[List[Tuple]]:
+    def fetch_records(self, limit: Optional[int] = None, offset: int = 0) -> Optional[List[Tuple]]:
         """
-        Fetch all records from the shipping_tariffs table.
+        Fetch records from the shipping_tariffs table.
         
+        Args:
+            limit: Maximum number of records to return, all records if None
+            offset: Number of records to skip
+            
         Returns:
             List of record tuples or None if an error occurred
         """
-        query = """
-        SELECT *
-        FROM shipping_tariffs;
-        """
-        conn = None
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query)
-            records = cursor.fetchall()
+            records = list(self.iter_records(limit=limit, offset=offset))
             logger.info("Fetched %s records from database", len(records))
             return records
         except Exception as e:
             logger.error("Error fetching records: %s", str(e))
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def insert_record(self, data: tuple) -> bool:
         """
@@ -118,66 +203,119 @@ class TariffDB:
         
         Args:
             data: Tuple containing (Country, Type, Liner Name, Port, Equipment Type, 
-                  Currency, Free days, Bucket 1, Bucket 2, Bucket 3, doc_id)
+                  Currency, Free days, Bucket 1, Bucket 2, Bucket 3)
         
         Returns:
             bool: True if successful, False if an error occurred
         """
-        query = """
-        INSERT OR REPLACE INTO shipping_tariffs (
-            Country,
-            Type,
-            "Liner Name",
-            Port,
-            "Equipment Type",
-            Currency,
-            "Free days",
-            "Bucket 1",
-            "Bucket 2",
-            "Bucket 3"
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """
-        conn = None
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query, data)
-            conn.commit()
-            logger.info("Record inserted successfully: %s", data[-1])  # Log doc_id
+            with self._lock:
+                self._conn.execute(_INSERT_SQL, data)
+            self.cache_clear()
+            logger.info("Record inserted successfully: %s", data)
             return True
         except Exception as e:
             logger.error("Error inserting record: %s, Data: %s", str(e), data )
             return False
-        finally:
-            if conn:
-                conn.close()
 
-    def query_by_country(self, country: str) -> Optional[List[Tuple]]:
+    def insert_many(self, rows: List[tuple]) -> int:
         """
-        Query records for a specific country.
+        Insert multiple tariff records in a single transaction.
+        
+        Args:
+            rows: List of tuples, each in the same column order as insert_record
+        
+        Returns:
+            int: Number of records inserted, 0 if an error occurred
+        """
+        if not rows:
+            return 0
+
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE;")
+                cursor = self._conn.executemany(_INSERT_SQL, rows)
+                self._conn.execute("COMMIT;")
+                self.cache_clear()
+                # Refresh planner statistics when they went stale (runs ANALYZE if needed)
+                self._conn.execute("PRAGMA optimize;")
+                logger.info("Inserted %s records in one transaction", cursor.rowcount)
+                return cursor.rowcount
+            except Exception as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK;")
+                logger.error("Error inserting records: %s", str(e))
+                return 0
+
+    def get_pdf_validators(self, pdf_uuid: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        Look up the ETag and Last-Modified of the last download of a PDF.
+        
+        Args:
+            pdf_uuid: UUID of the PDF
+            
+        Returns:
+            Tuple of (etag, last_modified), or None if the PDF was never downloaded
+        """
+        try:
+            with self._lock:
+                return self._conn.execute(_SELECT_PDF_CACHE_SQL, (pdf_uuid,)).fetchone()
+        except Exception as e:
+            logger.error("Error reading PDF cache for %s: %s", pdf_uuid, str(e))
+            return None
+
+    def save_pdf_validators(self, pdf_uuid: str, etag: Optional[str],
+                            last_modified: Optional[str]) -> bool:
+        """
+        Remember the ETag and Last-Modified of a downloaded PDF.
+        
+        Args:
+            pdf_uuid: UUID of the PDF
+            etag: ETag response header
+            last_modified: Last-Modified response header
+            
+        Returns:
+            bool: True if successful, False if an error occurred
+        """
+        try:
+            with self._lock:
+                self._conn.execute(_UPSERT_PDF_CACHE_SQL, (pdf_uuid, etag, last_modified))
+            return True
+        except Exception as e:
+            logger.error("Error saving PDF cache for %s: %s", pdf_uuid, str(e))
+            return False
+
+    def cache_clear(self) -> None:
+        """Drop all cached country lookups."""
+        self._query_cached.cache_clear()
+
+    def _query_country(self, country: str) -> Tuple[Tuple, ...]:
+        """
+        Run the country lookup against the database.
         
         Args:
             country: Country name to search for
             
         Returns:
-            List of matching records or None if an error occurred
+            Tuple of matching records, immutable so it is safe to cache
         """
-        query = """
-        SELECT *
-        FROM shipping_tariffs
-        WHERE Country = ?;
+        with self._lock:
+            return tuple(self._conn.execute(_SELECT_BY_COUNTRY_SQL, (country,)).fetchall())
+
+    def query_by_country(self, country: str) -> Optional[Tuple[Tuple, ...]]:
+        """
+        Query records for a specific country.
+        
+        Args:
+            country: Country name to search for
+            
+        Returns:
+            Tuple of matching records or None if an error occurred
         """
-        conn = None
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query, (country,))
-            records = cursor.fetchall()
+            records = self._query_cached(country)
             logger.info("Found %s records for country: %s", len(records), country)
             return records
         except Exception as e:
             logger.error("Error querying by country: %s", str(e))
             return None
-        finally:
-            if conn:
-                conn.close()
@@ -0,0 +1,20 @@
+import os
+import sys
+import types
+
+import pytest
+
+# Make the src package importable, as the services do for themselves
+cwd = os.path.realpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(cwd)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """TariffDB backed by a fresh database file."""
+    from src.services.sqlite import TariffDB
+
+    config = types.SimpleNamespace(sqlite=types.SimpleNamespace(name=str(tmp_path / "tariff.db")))
+    database = TariffDB(config=config)
+    yield database
+    database.close()
@@ -0,0 +1,93 @@
+import types
+
+import numpy as np
+import pytest
+
+from src.services.extractor import Extractor
+
+
+def extractor(overlap_thrs=0.5):
+    # Skip __init__, which loads the YOLO model
+    ex = Extractor.__new__(Extractor)
+    ex.overlap_thrs = overlap_thrs
+    return ex
+
+
+def test_suppress_overlaps_keeps_highest_confidence_box():
+    boxes = np.array([[0, 0, 100, 100], [5, 5, 100, 100], [200, 200, 300, 300]])
+    confs = np.array([0.6, 0.9, 0.5])
+    kept = extractor().suppress_overlaps(boxes=boxes, confs=confs)
+    assert kept.tolist() == [[5, 5, 100, 100], [200, 200, 300, 300]]
+
+
+def test_suppress_overlaps_keeps_boxes_below_threshold():
+    # IoU of these boxes is 1/3
+    boxes = np.array([[0, 0, 100, 100], [50, 0, 150, 100]])
+    kept = extractor(overlap_thrs=0.5).suppress_overlaps(boxes=boxes, confs=np.array([0.8, 0.7]))
+    assert len(kept) == 2
+    kept = extractor(overlap_thrs=0.3).suppress_overlaps(boxes=boxes, confs=np.array([0.8, 0.7]))
+    assert kept.tolist() == [[0, 0, 100, 100]]
+
+
+def test_suppress_overlaps_empty():
+    kept = extractor().suppress_overlaps(boxes=np.empty((0, 4), dtype=int), confs=np.empty(0))
+    assert kept.shape == (0, 4)
+
+
+class FakeDownload:
+    """Streamed response that fails after its first chunk."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield b"weights"
+        raise ConnectionError("connection reset")
+
+
+def test_failed_model_download_leaves_no_file(tmp_path, monkeypatch):
+    from src.services import extractor as extractor_module
+
+    ex = extractor()
+    ex.model_path = str(tmp_path / "model.pt")
+    ex.cfg = types.SimpleNamespace(extractor=types.SimpleNamespace(model_url="https://example.com/model.pt"))
+    monkeypatch.setattr(extractor_module.requests, "get", lambda *args, **kwargs: FakeDownload())
+
+    assert ex.download_file() is False
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_detect_tables_fails_the_pdf_when_cropping_fails():
+    ex = extractor()
+    ex.batch_size = 8
+    ex.conf_thrs = 0.2
+    # Detections without boxes make extract_tables raise
+    ex.prediction = lambda images: [object() for _ in images]
+
+    assert ex.detect_tables(filename="in.pdf", images=["page"] * 2) is None
+
+
+def test_clear_pdf_removes_pdf_and_empty_directory(tmp_path):
+    pdf = tmp_path / "India" / "in.pdf"
+    pdf.parent.mkdir()
+    pdf.write_bytes(b"%PDF")
+
+    extractor().clear_pdf(pdf_path=str(pdf))
+    assert not pdf.parent.exists()
+    # Already removed
+    extractor().clear_pdf(pdf_path=str(pdf))
+
+
+def test_clear_pdf_raises_when_the_pdf_cannot_be_removed(tmp_path):
+    # os.remove fails on a directory, as it would on a permission error
+    pdf = tmp_path / "India" / "in.pdf"
+    pdf.mkdir(parents=True)
+
+    with pytest.raises(OSError):
+        extractor().clear_pdf(pdf_path=str(pdf))
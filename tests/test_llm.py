@@ -0,0 +1,30 @@
+import types
+
+import pytest
+
+from src.services.llm import ParseTables, _tariff_records
+
+
+@pytest.mark.parametrize("json_obj, expected", [
+    ({"tariffs": [{"a": 1}]}, [{"a": 1}]),
+    ({"tariffs": []}, []),
+    ([{"a": 1}], [{"a": 1}]),
+    ({"rows": [{"a": 1}], "count": 1}, [{"a": 1}]),
+    ({"a": [1], "b": [2]}, None),
+    ({}, None),
+    ("text", None),
+])
+def test_tariff_records(json_obj, expected):
+    assert _tariff_records(json_obj) == expected
+
+
+def response(content):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def test_parse_response_fails_on_unrecognised_shape():
+    # Skip __init__, which needs the OPENAI key
+    parser = ParseTables.__new__(ParseTables)
+    assert parser._parse_response(response('{"count": 0}')) is None
+    assert parser._parse_response(response('{"tariffs": []}')) == []
@@ -0,0 +1,185 @@
+import time
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FakeScraper:
+    def __init__(self, result):
+        self.result = result
+        self.saved = list()
+
+    def run(self, country):
+        return self.result
+
+    def save_validators(self, pdf_path):
+        self.saved.append(pdf_path)
+
+
+class FakeExtractor:
+    def __init__(self, pdfs=(("ok.pdf", ["table"] * 2), ("broken.pdf", None))):
+        self.pdfs = pdfs
+        self.cleared = list()
+
+    def iter_pdfs(self, country):
+        yield from self.pdfs
+
+    def clear_pdf(self, pdf_path):
+        self.cleared.append(pdf_path)
+
+
+class FakeParser:
+    def __init__(self, values=("India", "IB", "COSCO", "Port", "20GP", "USD", 5, 1, 2, 3)):
+        self.values = values
+
+    async def run_many(self, tables):
+        record = types.SimpleNamespace(values=lambda: self.values)
+        return [[record] for _ in tables]
+
+
+class FailingParser:
+    """Fails every table whose index is in failed, as arun does when a request fails."""
+
+    def __init__(self, failed):
+        self.failed = failed
+
+    async def run_many(self, tables):
+        record = types.SimpleNamespace(values=lambda: FakeParser().values)
+        return [None if i in self.failed else [record] for i in range(len(tables))]
+
+
+@pytest.fixture
+def client(db):
+    # Services are swapped for fakes, so the lifespan handler (and the YOLO model) is skipped
+    main.jobs.clear()
+    main.app.state.db = db
+    main.app.state.ex_serv = FakeExtractor()
+    main.app.state.parser = FakeParser()
+    return TestClient(main.app)
+
+
+def test_upload_job_stores_rows_and_clears_processed_pdfs(client):
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.ex_serv = FakeExtractor(pdfs=[("ok.pdf", ["table"] * 2)])
+
+    job = client.post("/upload", params={"country": "India"}).json()
+    assert job["status"] == "queued"
+
+    # TestClient runs background tasks before returning the response
+    status = client.get(f"/upload/{job['job_id']}").json()
+    assert status["status"] == "completed"
+    assert status["inserted_records"] == 2
+    assert main.app.state.ex_serv.cleared == ["ok.pdf"]
+
+
+def test_upload_job_is_partial_when_a_pdf_fails_to_convert(client):
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "partial"
+    assert status["inserted_records"] == 2
+    assert status["kept_pdfs"] == ["broken.pdf"]
+    assert main.app.state.ex_serv.cleared == ["ok.pdf"]
+    assert main.app.state.scrap_serv.saved == ["ok.pdf"]
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/upload/missing").status_code == 404
+
+
+def test_upload_job_fails_when_scrape_fails(client):
+    main.app.state.scrap_serv = FakeScraper(None)
+
+    job_id = client.post("/upload", params={"country": "Atlantis"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "failed"
+    assert "Atlantis" in status["error"]
+
+
+def test_finished_jobs_expire(client):
+    main.jobs["old"] = {"status": "completed", "finished_at": time.time() - main.JOB_TTL - 1}
+    main.jobs["running"] = {"status": "running"}
+    main.expire_jobs()
+    assert sorted(main.jobs) == ["running"]
+
+
+def test_upload_job_keeps_pdf_when_insert_fails(client, db):
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.parser = FakeParser(values=("India",))    # too few columns
+
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "failed"
+    assert status["inserted_records"] == 0
+    assert main.app.state.ex_serv.cleared == []
+    assert db.fetch_records() == []
+
+
+def test_upload_job_keeps_pdf_when_a_table_fails_to_parse(client, db):
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.parser = FailingParser(failed={0})
+
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "failed"
+    assert status["inserted_records"] == 0
+    assert status["kept_pdfs"] == ["ok.pdf", "broken.pdf"]
+    assert main.app.state.ex_serv.cleared == []
+    # A 304 must not skip the kept PDFs on the next upload
+    assert main.app.state.scrap_serv.saved == []
+    # The table that did parse is stored on the retry, not now
+    assert db.fetch_records() == []
+
+
+def test_retry_after_a_failed_parse_stores_each_row_once(client, db):
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.ex_serv = FakeExtractor(pdfs=[("ok.pdf", ["table"] * 2)])
+    main.app.state.parser = FailingParser(failed={0})
+    client.post("/upload", params={"country": "India"})
+
+    main.app.state.parser = FakeParser()
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "completed"
+    assert status["inserted_records"] == 2
+    assert len(db.fetch_records()) == 2
+    assert main.app.state.ex_serv.cleared == ["ok.pdf"]
+
+
+def test_upload_job_fails_when_every_table_fails_to_parse(client, db):
+    # As with no OPENAI key set: arun returns None for every table
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.ex_serv = FakeExtractor(pdfs=[("ok.pdf", ["table"] * 2)])
+    main.app.state.parser = FailingParser(failed={0, 1})
+
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "failed"
+    assert status["inserted_records"] == 0
+    assert main.app.state.ex_serv.cleared == []
+    assert db.fetch_records() == []
+
+
+def test_upload_job_fails_without_saving_validators_when_pdf_removal_fails(client):
+    def clear_pdf(pdf_path):
+        raise PermissionError(pdf_path)
+
+    main.app.state.scrap_serv = FakeScraper(types.SimpleNamespace(status=True))
+    main.app.state.ex_serv = FakeExtractor(pdfs=[("ok.pdf", ["table"] * 2)])
+    main.app.state.ex_serv.clear_pdf = clear_pdf
+
+    job_id = client.post("/upload", params={"country": "India"}).json()["job_id"]
+
+    status = client.get(f"/upload/{job_id}").json()
+    assert status["status"] == "failed"
+    assert main.app.state.scrap_serv.saved == []
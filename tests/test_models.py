@@ -0,0 +1,43 @@
+import pytest
+from pydantic import ValidationError
+
+from src.models.extractor import ShippingTariff
+
+
+def tariff(**kwargs):
+    data = {
+        "Country": "India",
+        "Type": "IB",
+        "Liner_Name": "COSCO",
+        "Port": "Nhava Sheva",
+        "Equipment_Type": "20GP",
+        "Currency": "USD",
+        "Free_days": "5",
+    }
+    data.update(kwargs)
+    return ShippingTariff(**data)
+
+
+@pytest.mark.parametrize("blank", [None, "null", ""])
+def test_blank_buckets_become_none(blank):
+    assert tariff(Bucket_1=blank, Bucket_2=blank, Bucket_3=blank).Bucket_1 is None
+
+
+def test_numeric_strings_are_cast():
+    record = tariff(Bucket_1="10", Bucket_2=20.0)
+    assert (record.Free_days, record.Bucket_1, record.Bucket_2) == (5, 10, 20)
+
+
+def test_empty_names_become_none():
+    record = tariff(Liner_Name="", Port="")
+    assert record.Liner_Name is None and record.Port is None
+
+
+def test_free_days_is_required():
+    with pytest.raises(ValidationError):
+        tariff(Free_days="null")
+
+
+def test_extra_keys_are_ignored_and_values_keep_column_order():
+    record = tariff(Bucket_1=1, Bucket_2=2, Bucket_3=3, Comment="ignored")
+    assert record.values() == ("India", "IB", "COSCO", "Nhava Sheva", "20GP", "USD", 5, 1, 2, 3)
@@ -0,0 +1,214 @@
+import os
+
+import pytest
+from urllib3.exceptions import ProtocolError
+
+from src.models.config import Config
+from src.services import scrapper
+from src.services.scrapper import Scraper, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic / time.sleep so the bucket can be tested instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scrapper.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(scrapper.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_bucket_allows_burst_without_waiting(clock):
+    bucket = TokenBucket(rate=1, burst=3)
+    for _ in range(3):
+        bucket.consume()
+    assert clock.slept == 0
+
+
+def test_bucket_waits_for_refill_when_empty(clock):
+    bucket = TokenBucket(rate=0.5, burst=1)
+    bucket.consume()
+    bucket.consume()
+    assert clock.slept == pytest.approx(2.0)
+
+
+def test_penalize_honours_retry_after(clock):
+    bucket = TokenBucket(rate=100, burst=5)
+    assert bucket.penalize("7") == 7
+    bucket.consume()
+    assert clock.slept == pytest.approx(7.0)
+
+
+def test_penalize_doubles_and_caps_backoff(clock):
+    bucket = TokenBucket(rate=1, burst=1, max_backoff=5)
+    assert [bucket.penalize() for _ in range(4)] == [1, 2, 4, 5]
+    bucket.reset()
+    assert bucket.penalize() == 1
+
+
+@pytest.fixture
+def scraper(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)    # the scraper creates its download dir relative to cwd
+    return Scraper(config=Config.from_yaml(f"{scrapper.cwd}/src/config.yaml"), db=db)
+
+
+def test_conditional_headers_empty_for_unknown_pdf(scraper):
+    assert scraper._conditional_headers("uuid-1") == {}
+
+
+def test_conditional_headers_from_saved_validators(scraper, db):
+    db.save_pdf_validators("uuid-1", '"v1"', "Wed, 01 Jan 2025 00:00:00 GMT")
+    assert scraper._conditional_headers("uuid-1") == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+    }
+
+    db.save_pdf_validators("uuid-2", None, "Wed, 01 Jan 2025 00:00:00 GMT")
+    assert scraper._conditional_headers("uuid-2") == {
+        "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+    }
+
+
+def test_conditional_headers_without_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = Scraper(config=Config.from_yaml(f"{scrapper.cwd}/src/config.yaml"))
+    assert scraper._conditional_headers("uuid-1") == {}
+
+
+def test_injected_session_gets_retrying_adapter(tmp_path, monkeypatch):
+    import requests
+
+    monkeypatch.chdir(tmp_path)
+    session = requests.Session()
+    scraper = Scraper(config=Config.from_yaml(f"{scrapper.cwd}/src/config.yaml"), session=session)
+    assert scraper._session is session
+    assert session.adapters["https://"].max_retries.total == 5
+
+
+class FakeRaw:
+    """Response body that optionally fails after its first block."""
+
+    def __init__(self, data, fail=False):
+        self.data = data
+        self.fail = fail
+        self.decode_content = False
+
+    def read(self, size=-1):
+        if not self.data:
+            if self.fail:
+                raise ProtocolError("connection reset")
+            return b""
+        chunk, self.data = self.data, b""
+        return chunk
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, raw=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.raw = raw
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.headers = list()
+
+    def get(self, url, headers, timeout, stream):
+        self.headers.append(headers)
+        return self.response
+
+
+PDF_HEADERS = {"content-type": "application/*;charset=utf-8", "ETag": '"v1"'}
+
+
+@pytest.fixture
+def download(scraper, monkeypatch, tmp_path):
+    """Run download_pdf against a canned response, without waiting on the rate limiter."""
+    monkeypatch.setattr(scrapper, "_rate", TokenBucket(rate=1000, burst=1000))
+    path = str(tmp_path / "in.pdf")
+
+    def _download(response):
+        scraper._download_session = FakeSession(response)
+        return scraper.download_pdf("uuid-1", path), path
+
+    return _download
+
+
+def test_download_saves_validators_only_once_stored(scraper, db, download):
+    ok, path = download(FakeResponse(200, PDF_HEADERS, FakeRaw(b"%PDF")))
+    assert ok
+    assert open(path, "rb").read() == b"%PDF"
+    assert not os.path.exists(path + ".part")
+    # The PDF's rows are not stored yet, so the next download must not get a 304
+    assert db.get_pdf_validators("uuid-1") is None
+
+    scraper.save_validators(pdf_path=path)
+    assert db.get_pdf_validators("uuid-1") == ('"v1"', None)
+    assert scraper._conditional_headers("uuid-1") == {"If-None-Match": '"v1"'}
+
+
+def test_download_not_modified_writes_nothing(scraper, db, download, tmp_path):
+    db.save_pdf_validators("uuid-1", '"v1"', None)
+
+    ok, path = download(FakeResponse(304))
+    assert ok
+    assert scraper._download_session.headers == [{"If-None-Match": '"v1"'}]
+    assert list(tmp_path.glob("in.pdf*")) == []
+
+
+def test_failed_download_removes_partial_file(scraper, db, download, tmp_path):
+    ok, path = download(FakeResponse(200, PDF_HEADERS, FakeRaw(b"%PDF", fail=True)))
+    assert not ok
+    assert list(tmp_path.glob("in.pdf*")) == []
+
+    scraper.save_validators(pdf_path=path)
+    assert db.get_pdf_validators("uuid-1") is None
+
+
+class InfoSession:
+    """Answers info requests with the given responses in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def get(self, url, timeout, headers=None):
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def bucket(clock, monkeypatch):
+    fresh = TokenBucket(rate=1000, burst=1000)
+    monkeypatch.setattr(scrapper, "_rate", fresh)
+    return fresh
+
+
+def test_info_429_backs_off(scraper, bucket):
+    scraper._session = InfoSession(FakeResponse(429, {"Retry-After": "9"}))
+    assert scraper.fetch_tariff_info("India") is None
+    assert bucket._backoff == 9
+
+
+def test_info_failed_fallback_keeps_backoff(scraper, bucket):
+    scraper._session = InfoSession(FakeResponse(403, {"Retry-After": "4"}), FakeResponse(500))
+    assert scraper.fetch_tariff_info("India") is None
+    assert bucket._backoff == 4
@@ -0,0 +1,49 @@
+def row(country="India", free_days=1):
+    return (country, "IB", "COSCO", "Nhava Sheva", "20GP", "USD", free_days, 10, 20, None)
+
+
+def test_insert_many_inserts_all_rows(db):
+    assert db.insert_many([row(free_days=i) for i in range(5)]) == 5
+    assert len(db.fetch_records()) == 5
+
+
+def test_insert_many_empty(db):
+    assert db.insert_many([]) == 0
+
+
+def test_insert_many_rolls_back_on_error(db):
+    # The short tuple fails half way through the batch
+    assert db.insert_many([row(), row(), ("India",)]) == 0
+    assert db.fetch_records() == []
+    assert not db._conn.in_transaction
+
+
+def test_fetch_records_pages_in_insert_order(db):
+    db.insert_many([row(free_days=i) for i in range(10)])
+    pages = [db.fetch_records(limit=3, offset=o) for o in range(0, 10, 3)]
+    free_days = [r[6] for page in pages for r in page]
+    assert free_days == list(range(10))
+
+
+def test_iter_records_streams_in_batches(db):
+    db.insert_many([row(free_days=i) for i in range(25)])
+    assert sum(1 for _ in db.iter_records(batch_size=4)) == 25
+
+
+def test_query_by_country_cache_is_invalidated_on_insert(db):
+    db.insert_many([row("India")])
+    assert len(db.query_by_country("India")) == 1
+    assert db.query_by_country("India") is db.query_by_country("India")
+
+    db.insert_record(row("India"))
+    assert len(db.query_by_country("India")) == 2
+    db.insert_many([row("India")])
+    assert len(db.query_by_country("India")) == 3
+    assert db.query_by_country("Kenya") == ()
+
+
+def test_pdf_validators_roundtrip(db):
+    assert db.get_pdf_validators("uuid-1") is None
+    assert db.save_pdf_validators("uuid-1", '"v1"', None)
+    assert db.save_pdf_validators("uuid-1", '"v2"', "Wed, 01 Jan 2025 00:00:00 GMT")
+    assert db.get_pdf_validators("uuid-1") == ('"v2"', "Wed, 01 Jan 2025 00:00:00 GMT")